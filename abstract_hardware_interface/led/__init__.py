@@ -105,6 +105,17 @@ class AbstractLed:
         :param color: RGB color value as a tuple of ints
         """
 
+    def set_pixels(self, pixels: list):
+        """
+        Set LEDs to match a pre-assembled frame in one call, deferring the
+        update until `show`. The base implementation iterates `set_led`;
+        drivers with a bulk transfer interface should override this with a
+        single transaction.
+        :param pixels: ordered list of RGB color tuples, one per LED
+        """
+        for led, color in enumerate(pixels):
+            self.set_led(led, color, False)
+
     @abstractmethod
     def show(self):
         """
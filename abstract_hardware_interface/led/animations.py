@@ -26,9 +26,10 @@
 # NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
 # SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-from abc import abstractmethod
-from threading import Event
-from time import time, sleep
+import sched
+
+from threading import Event, Lock, Thread, Timer
+from time import monotonic
 from typing import Optional
 
 from abstract_hardware_interface.led import AbstractLed, Color
@@ -37,49 +38,254 @@ from abstract_hardware_interface.led import AbstractLed, Color
 class LedAnimation:
     def __init__(self, leds: AbstractLed, **kwargs):
         self.leds = leds
+        self.stopping = Event()
+        self._next_tick = None
+        self._frames = None
+        self._frame_idx = 0
+        self._loop = True
+
+    def _compile_frames(self) -> Optional[list]:
+        """
+        Get the complete list of (pixels, delay) frames for a deterministic
+        animation, where pixels is an ordered list of RGB tuples, one per
+        LED.
+        :returns: compiled frame list, or None if this animation can't be
+            precompiled
+        """
+        return None
+
+    def setup(self):
+        """
+        Prepare any per-run state before the first call to `tick`.
+        """
+        self._frames = self._compile_frames()
+        self._frame_idx = 0
+
+    def tick(self) -> Optional[float]:
+        """
+        Render a single animation frame.
+        :returns: delay in seconds until the next frame, or None if the
+            animation is complete
+        """
+        if self._frames is None:
+            raise NotImplementedError
+        if not self._frames:
+            # Nothing to render, e.g. zero blinks requested
+            return None
+        pixels, delay = self._frames[self._frame_idx]
+        self.leds.set_pixels(pixels)
+        self.leds.show()
+        self._frame_idx += 1
+        if self._frame_idx >= len(self._frames):
+            if not self._loop:
+                return None
+            self._frame_idx = 0
+        return delay
 
-    @abstractmethod
     def start(self, timeout: Optional[int] = None):
         """
-        Start the animation.
+        Start the animation, blocking until it completes or is stopped.
         :param timeout: Optional timeout in seconds after which animation stops
         """
+        self.stopping.clear()
+        self._next_tick = monotonic()
+        timer = self._schedule_timeout(timeout)
+        self.setup()
+        # Bind the hot attributes to locals; this loop can run hundreds of
+        # times per second on low-power boards
+        is_stopped = self.stopping.is_set
+        tick = self.tick
+        pace = self._pace
+        try:
+            while not is_stopped():
+                delay = tick()
+                if delay is None:
+                    break
+                pace(delay)
+        finally:
+            if timer:
+                timer.cancel()
 
-    @abstractmethod
     def stop(self):
         """
-        Stop the animation and reset LEDs to black.
+        Stop the animation.
         """
         # TODO: Get state before animation and restore it here
+        self.stopping.set()
+
+    def _schedule_timeout(self, timeout: Optional[int]) -> Optional[Timer]:
+        """
+        Schedule `self.stop` to be called after the requested timeout so
+        animation loops don't have to poll the clock every frame.
+        :param timeout: Optional timeout in seconds after which animation stops
+        :returns: started Timer to be cancelled when the animation ends, if any
+        """
+        if not timeout:
+            return None
+        timer = Timer(timeout, self.stop)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def _pace(self, period: float):
+        """
+        Wait until the next frame deadline. Deadlines advance in absolute
+        `period` increments so time spent rendering a frame doesn't
+        accumulate as drift in the overall cadence.
+        :param period: seconds between frames
+        """
+        if self._next_tick is None:
+            self._next_tick = monotonic()
+        self._next_tick += period
+        delay = self._next_tick - monotonic()
+        if delay > 0:
+            # Wait on the stopping Event rather than sleeping so stop()
+            # interrupts the delay instead of waiting out the full frame
+            self.stopping.wait(delay)
+
+
+class AnimationRunner:
+    """
+    Drives animations by their `tick` methods from a single background
+    scheduler thread, as an alternative to each animation blocking its own
+    thread in `start`. Any number of animations can run concurrently on the
+    one thread.
+    """
+    def __init__(self):
+        self._scheduler = sched.scheduler(monotonic, self._delay)
+        self._wake = Event()
+        self._stopping = Event()
+        self._thread = None
+        self._lock = Lock()
+
+    def _delay(self, period: float):
+        """
+        Scheduler delay function. Waits on the wake Event rather than
+        sleeping so newly scheduled animations and `shutdown` preempt a
+        pending frame delay instead of waiting it out.
+        :param period: seconds until the next scheduled frame
+        """
+        if self._wake.wait(period) and not self._stopping.is_set():
+            self._wake.clear()
+
+    def run(self, animation: LedAnimation, timeout: Optional[int] = None):
+        """
+        Start an animation on the scheduler thread and return immediately.
+        Use `animation.stop` to end it early.
+        :param animation: animation to run
+        :param timeout: Optional timeout in seconds after which animation stops
+        """
+        with self._lock:
+            if self._stopping.is_set():
+                # The runner was shut down; wait for the old scheduler
+                # thread to exit so a new one can be started cleanly
+                if self._thread and self._thread.is_alive():
+                    self._thread.join(timeout=1)
+                self._stopping.clear()
+                self._wake.clear()
+            animation.stopping.clear()
+            animation.setup()
+            timer = animation._schedule_timeout(timeout)
+            self._scheduler.enter(0, 1, self._tick, (animation, timer))
+            self._wake.set()
+            if not self._thread or not self._thread.is_alive():
+                self._thread = Thread(target=self._run_loop, daemon=True)
+                self._thread.start()
+
+    def shutdown(self):
+        """
+        Stop the scheduler thread. Animations already scheduled will not
+        advance any further.
+        """
+        self._stopping.set()
+        for event in self._scheduler.queue:
+            try:
+                self._scheduler.cancel(event)
+            except ValueError:
+                continue
+            timer = event.argument[1]
+            if timer:
+                timer.cancel()
+        self._wake.set()
+
+    def _tick(self, animation: LedAnimation, timer: Optional[Timer]):
+        if not self._stopping.is_set() and not animation.stopping.is_set():
+            delay = animation.tick()
+            if delay is not None:
+                self._scheduler.enter(delay, 1, self._tick, (animation, timer))
+                return
+        if timer:
+            timer.cancel()
+
+    def _run_loop(self):
+        while not self._stopping.is_set():
+            self._wake.clear()
+            if self._stopping.is_set():
+                # shutdown() may have set the wake Event between the loop
+                # check and the clear above; don't sleep through it
+                break
+            self._scheduler.run()
+            self._wake.wait()
+
+
+_shared_runner = None
+_shared_runner_lock = Lock()
+
+
+def get_animation_runner() -> AnimationRunner:
+    """
+    Get the shared AnimationRunner. Using this instead of constructing
+    runners directly keeps every concurrently running animation on one
+    scheduler thread.
+    """
+    global _shared_runner
+    with _shared_runner_lock:
+        if _shared_runner is None:
+            _shared_runner = AnimationRunner()
+    return _shared_runner
 
 
 class BreatheLedAnimation(LedAnimation):
-    def __init__(self, leds: AbstractLed, color: Color):
+    def __init__(self, leds: AbstractLed, color: Color,
+                 one_shot: bool = False):
         LedAnimation.__init__(self, leds)
         self.color_tuple = color.as_rgb_tuple()
+        self.one_shot = one_shot
         self.step = 0.05
         self.step_delay = 0.05
-        self.stopping = Event()
+        self._ramp = None
+        self._ramp_step = None
 
-    def start(self, timeout=None):
-        self.stopping.clear()
-        end_time = time() + timeout if timeout else None
-        brightness = 1
-        step = -1 * self.step
-        while not self.stopping.is_set():
-            if brightness >= 1:  # Going Down
-                step = -1 * self.step
-            elif brightness <= 0:
-                step = self.step
-
-            brightness += step
-            self.leds.fill(tuple(brightness * part for part in self.color_tuple))
-            sleep(self.step_delay)
-            if end_time and time() > end_time:
-                self.stop()
+    def _build_ramp(self) -> list:
+        """
+        Get the list of per-frame RGB tuples for one full breathe cycle
+        (off -> full color -> off). The list is computed once and reused
+        until `step` is changed.
+        """
+        if self._ramp is None or self._ramp_step != self.step:
+            steps = int(round(1.0 / self.step))
+            red, green, blue = self.color_tuple
+            ramp_up = [(red * i // steps, green * i // steps,
+                        blue * i // steps) for i in range(steps + 1)]
+            self._ramp = ramp_up + ramp_up[-2:0:-1]
+            self._ramp_step = self.step
+        return self._ramp
+
+    def _compile_frames(self) -> list:
+        num_leds = self.leds.num_leds
+        frames = [([rgb] * num_leds, self.step_delay)
+                  for rgb in self._build_ramp()]
+        if self.one_shot:
+            # End the single pass fully off
+            frames.append(frames[0])
+        return frames
+
+    def setup(self):
+        LedAnimation.setup(self)
+        self._loop = not self.one_shot
 
     def stop(self):
-        self.stopping.set()
+        LedAnimation.stop(self)
         # TODO: Get LED state at start and restore it here
         self.leds.fill(Color.BLACK.as_rgb_tuple())
 
@@ -92,47 +298,162 @@ class ChaseLedAnimation(LedAnimation):
         self.background_color_tuple: tuple = background_color.as_rgb_tuple()
         self.step = 0.05
         self.step_delay = 0.1
-        self.stopping = Event()
 
-    def start(self, timeout=None):
-        self.stopping.clear()
-        end_time = time() + timeout if timeout else None
+    def _compile_frames(self) -> list:
+        num_leds = self.leds.num_leds
+        background = [self.background_color_tuple] * num_leds
+        frames = []
+        for led in range(num_leds):
+            pixels = background.copy()
+            pixels[led] = self.foreground_color_tuple
+            frames.append((pixels, self.step_delay))
+        return frames
 
-        self.leds.fill(self.background_color_tuple)
-        while not self.stopping.is_set():
-            for led in range(0, self.leds.num_leds):
-                self.leds.set_led(led, self.foreground_color_tuple)
-                sleep(self.step_delay)
-                self.leds.set_led(led, self.background_color_tuple)
-            if end_time and time() > end_time:
-                self.stop()
 
-    def stop(self):
-        self.stopping.set()
+class LoopFillLedAnimation(LedAnimation):
+    def __init__(self, leds: AbstractLed, fill_color: Color,
+                 reverse: bool = False):
+        LedAnimation.__init__(self, leds)
+        self.fill_color_tuple = fill_color.as_rgb_tuple()
+        self.reverse = reverse
+        self.step_delay = 0.02
+        self._order = None
+        self._order_reversed = None
+        self._led_idx = 0
+
+    def _get_order(self) -> range:
+        """
+        Get the LED indices in fill order. The range is built once and
+        reused until `reverse` is changed.
+        """
+        if self._order is None or self._order_reversed != self.reverse:
+            num_leds = self.leds.num_leds
+            self._order = range(num_leds - 1, -1, -1) if self.reverse \
+                else range(num_leds)
+            self._order_reversed = self.reverse
+        return self._order
 
+    def setup(self):
+        self._led_idx = 0
 
-class LoopFillLedAnimation(LedAnimation):
+    def tick(self) -> Optional[float]:
+        order = self._get_order()
+        if self._led_idx >= len(order):
+            return None
+        self.leds.set_led(order[self._led_idx], self.fill_color_tuple)
+        self._led_idx += 1
+        return self.step_delay
+
+
+class RefillLedAnimation(LedAnimation):
     def __init__(self, leds: AbstractLed, fill_color: Color,
                  reverse: bool = False):
         LedAnimation.__init__(self, leds)
         self.fill_color_tuple = fill_color.as_rgb_tuple()
         self.reverse = reverse
         self.step_delay = 0.02
+        self._orders = None
+        self._colors = None
+        self._phase = 0
+        self._led_idx = 0
+        self._fwd_order = None
+        self._rev_order = None
+
+    def _get_orders(self) -> tuple:
+        """
+        Get the forward and reverse LED index ranges. Both are built once
+        on first use and reused for every subsequent run.
+        """
+        if self._fwd_order is None:
+            num_leds = self.leds.num_leds
+            self._fwd_order = range(num_leds)
+            self._rev_order = range(num_leds - 1, -1, -1)
+        return self._fwd_order, self._rev_order
 
-    def start(self, timeout=None):
-        leds = list(range(0, self.leds.num_leds))
-        if self.reverse:
-            leds.reverse()
-        for led in leds:
-            self.leds.set_led(led, self.fill_color_tuple)
-            sleep(self.step_delay)
+    def setup(self):
+        forward, backward = self._get_orders()
+        order = backward if self.reverse else forward
+        # Refill runs the color and black phases in the same direction
+        self._orders = (order, order)
+        self._colors = (self.fill_color_tuple, Color.BLACK.as_rgb_tuple())
+        self._phase = 0
+        self._led_idx = 0
+
+    def tick(self) -> Optional[float]:
+        order = self._orders[self._phase]
+        self.leds.set_led(order[self._led_idx], self._colors[self._phase])
+        self._led_idx += 1
+        if self._led_idx >= len(order):
+            self._led_idx = 0
+            self._phase ^= 1
+        return self.step_delay
+
+    def stop(self):
+        LedAnimation.stop(self)
+        self.leds.fill(Color.BLACK.as_rgb_tuple())
+
+
+class BounceLedAnimation(RefillLedAnimation):
+    def setup(self):
+        RefillLedAnimation.setup(self)
+        forward, backward = self._get_orders()
+        # Bounce empties in the opposite direction it filled
+        self._orders = (backward, forward) if self.reverse \
+            else (forward, backward)
+
+
+class BlinkLedAnimation(LedAnimation):
+    def __init__(self, leds: AbstractLed, color: Color,
+                 num_blinks: int = 2, repeat: bool = False):
+        LedAnimation.__init__(self, leds)
+        self.color_tuple = color.as_rgb_tuple()
+        self.num_blinks = num_blinks
+        self.repeat = repeat
+        self.on_delay = 0.25
+        self.off_delay = 0.5
+
+    def _compile_frames(self) -> list:
+        num_leds = self.leds.num_leds
+        on_frame = [self.color_tuple] * num_leds
+        off_frame = [Color.BLACK.as_rgb_tuple()] * num_leds
+        return [(on_frame, self.on_delay),
+                (off_frame, self.off_delay)] * self.num_blinks
+
+    def setup(self):
+        LedAnimation.setup(self)
+        self._loop = self.repeat
 
     def stop(self):
-        pass
+        LedAnimation.stop(self)
+        self.leds.fill(Color.BLACK.as_rgb_tuple())
+
+
+class AlternatingLedAnimation(LedAnimation):
+    def __init__(self, leds: AbstractLed, color: Color):
+        LedAnimation.__init__(self, leds)
+        self.color_tuple = color.as_rgb_tuple()
+        self.delay = 0.5
+
+    def _compile_frames(self) -> list:
+        black = Color.BLACK.as_rgb_tuple()
+        num_leds = self.leds.num_leds
+        even_frame = [self.color_tuple if led % 2 == 0 else black
+                      for led in range(num_leds)]
+        odd_frame = [black if led % 2 == 0 else self.color_tuple
+                     for led in range(num_leds)]
+        return [(even_frame, self.delay), (odd_frame, self.delay)]
+
+    def stop(self):
+        LedAnimation.stop(self)
+        self.leds.fill(Color.BLACK.as_rgb_tuple())
 
 
 animations = {
     'breathe': BreatheLedAnimation,
     'chase': ChaseLedAnimation,
-    'loop_fill': LoopFillLedAnimation
+    'loop_fill': LoopFillLedAnimation,
+    'refill': RefillLedAnimation,
+    'bounce': BounceLedAnimation,
+    'blink': BlinkLedAnimation,
+    'alternating': AlternatingLedAnimation
 }